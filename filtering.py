@@ -2,35 +2,36 @@ import os
 import pandas as pd
 
 
-def assessment_window_filtering(assessment_list, source_path):
+WINDOW_MAP = {
+    'Screening': 'Screening',
+    'Baseline': 'Baseline',
+    '2-month post-baseline': 'T1',
+    '6-month post-baseline': 'T2',
+    '12-month post-baseline': 'T3'
+}
+CODE_MAP = {
+    'Screening': 0,
+    'Baseline': 0,
+    '2-month post-baseline': 1,
+    '6-month post-baseline': 2,
+    '12-month post-baseline': 3
+}
+
+
+def assessment_window_filtering(assessment_list, source_path, index=None):
     '''
     If "Screening" is not needed, this function must be modified since Screening and Baseline share the same value ...
     '''
     print(f"\nFiltering by {assessment_list} assessment window ...")
 
-    window_map = {
-        'Screening': 'Screening',
-        'Baseline': 'Baseline',
-        '2-month post-baseline': 'T1',
-        '6-month post-baseline': 'T2',
-        '12-month post-baseline': 'T3'
-    }
-    code_map = {
-        'Screening': 0,
-        'Baseline': 0,
-        '2-month post-baseline': 1,
-        '6-month post-baseline': 2,
-        '12-month post-baseline': 3
-    }
-
     windows = assessment_list
     if not windows:
         raise ValueError("'assessment_list' does not contain any defined values.")
     if not isinstance(windows, list):
         windows = [windows]
 
-    target_values = [window_map[value] for value in windows if value in window_map]
-    target_codes = [code_map[value] for value in windows if value in code_map]
+    target_values = [WINDOW_MAP[value] for value in windows if value in WINDOW_MAP]
+    target_codes = [CODE_MAP[value] for value in windows if value in CODE_MAP]
     pattern_values = '|'.join(target_values)
 
     target_codes_str = [str(code) for code in target_codes]
@@ -42,6 +43,7 @@ def assessment_window_filtering(assessment_list, source_path):
             continue
 
         file_path = os.path.join(source_path, filename)
+        table = index.table_of(filename, stage='export') if index is not None else None
         try:
             df = pd.read_csv(file_path, sep=';')
 
@@ -61,6 +63,8 @@ def assessment_window_filtering(assessment_list, source_path):
 
             filtered_df.to_csv(os.path.join(source_path, filename), index=False, sep=';')
             filtered_files[filename] = filtered_df
+            if table is not None:
+                index.record(filtered_df, table, stage='window', filename=filename)
             print(f"Saved {filename} ({len(filtered_df)} rows)")
 
         except Exception as e:
@@ -69,7 +73,7 @@ def assessment_window_filtering(assessment_list, source_path):
     return filtered_files
 
 
-def filtering_excluded_ids(baseline_ids_path, source_path):
+def filtering_excluded_ids(baseline_ids_path, source_path, index=None):
     print("\nRemoving excluded ids from baselines...")
     filenames = []
     processed_dataframes = []
@@ -80,6 +84,7 @@ def filtering_excluded_ids(baseline_ids_path, source_path):
     for filename in os.listdir(source_path):
         if filename.endswith('.csv') and filename.endswith('_filter_window.csv'):
             file_path = os.path.join(source_path, filename)
+            table = index.table_of(filename, stage='window') if index is not None else None
             df = pd.read_csv(file_path, sep=';')
 
             if 'participant_identifier' not in df.columns:
@@ -95,12 +100,14 @@ def filtering_excluded_ids(baseline_ids_path, source_path):
 
             out_path_headers = os.path.join(source_path, f"ITEM_{filename}")
             df.to_csv(out_path_headers, index=False, sep=";")
+            if table is not None:
+                index.record(df, table, stage='ids', filename=out_path_headers)
             print(f"Saved {filename} ({len(df)} rows)")
 
     return processed_dataframes, filenames
 
 
-def filtering_interesting_ids(baseline_ids_path, source_path):
+def filtering_interesting_ids(baseline_ids_path, source_path, index=None):
     print("\nFiltering additional interesting_ids...")
     filenames = []
     processed_dataframes = []
@@ -111,6 +118,7 @@ def filtering_interesting_ids(baseline_ids_path, source_path):
     for filename in os.listdir(source_path):
         if filename.endswith('.csv') and filename.startswith('ITEM'):
             file_path = os.path.join(source_path, filename)
+            table = index.table_of(filename, stage='ids') if index is not None else None
             df = pd.read_csv(file_path, sep=';')
 
             if 'participant_identifier' not in df.columns:
@@ -126,6 +134,8 @@ def filtering_interesting_ids(baseline_ids_path, source_path):
 
             out_path_headers = os.path.join(source_path, filename)
             df.to_csv(out_path_headers, index=False, sep=";")
+            if table is not None:
+                index.record(df, table, stage='interesting', filename=out_path_headers)
             print(f"Saved {filename} ({len(df)} rows)")
 
     return processed_dataframes, filenames
@@ -4,7 +4,9 @@ import yaml
 import sqlite3
 import pandas as pd
 from filtering import assessment_window_filtering, filtering_interesting_ids, filtering_excluded_ids
-from utils import load_config_file, write_config_file, detect_separator
+from projection import read_schema, plan_projection, report_unknown_variables
+from release_index import ReleaseIndex, create_participants_summary_from_index, create_window_completeness_report
+from utils import load_config_file, write_config_file
 
 
 db_filepath = load_config_file('DB', 'current_db')
@@ -29,73 +31,35 @@ def read_yaml_file(filename):
         item = entry.get('item')
         names = entry.get('table', [])
         added_vars = entry.get('variables', [])
+        base_columns = entry.get('base_columns') or config.get('base_columns') or 'default'
         if item:
             item_map[item] = {
                 'table_name': names,
-                'variables': added_vars
+                'variables': added_vars,
+                'base_columns': base_columns
             }
 
     assessment_window = config.get('assessment_window', [])
-    return item_map, assessment_window
+    strict_variables = bool(config.get('strict_variables', False))
+    return item_map, assessment_window, strict_variables
 
 
-def get_columns_from_table(table_name):
+def prepare_tables_to_export(file_map, strict=False):
     conn = connect_db()
-    query = f"PRAGMA table_info('{table_name}')"
-    info = pd.read_sql_query(query, conn)
-    return info['name'].tolist()
-
-
-def prepare_tables_to_export(file_map):
-    tables_to_export = []
-    variables_to_export = []
+    schema = read_schema(conn)
+    conn.close()
 
-    conn = connect_db()
-    query = "SELECT name FROM sqlite_master WHERE type='table';"
-    all_tables = pd.read_sql_query(query, conn)['name'].tolist()
-
-    for item_number, item_data in file_map.items():
-
-        table_names = item_data.get('table_name', [])
-        if isinstance(table_names, str):
-            table_names = [table_names]
-        elif isinstance(table_names, list):
-            table_names = [name for name in table_names if isinstance(name, str)]
-
-        variables_to_add = item_data.get('variables', None)
-        if isinstance(variables_to_add, str):
-            variables_to_add = [variables_to_add]
-        elif isinstance(variables_to_add, list):
-            variables_to_add = [v for v in variables_to_add if isinstance(v, str)]
-
-        for table in table_names:
-            if table not in all_tables:
-                print(f"Warning: Table '{table}' not found in DB. Skipping.")
-                continue
-            if not variables_to_add:
-                tables_to_export.append({
-                    'item': item_number,
-                    'table': table,
-                    'columns': None
-                })
-            else:
-                cols = get_columns_from_table(table)
-                base_cols = cols[:10]
-                # base_cols = [cols[i] for i in range(7) if i != 1]  # TODO: Use only for DMMH
-                filter_cols = [c for c in variables_to_add if c in cols and c not in base_cols]
-                selected_cols = base_cols + filter_cols
-                tables_to_export.append({
-                    'item': item_number,
-                    'table': table,
-                    'columns': selected_cols
-                })
+    tables_to_export, unknown_variables = plan_projection(file_map, schema)
+    report_unknown_variables(unknown_variables)
+    if strict and unknown_variables:
+        raise ValueError("Requested variables not found in DB. Nothing was exported.")
 
     return tables_to_export
 
 
-def export_sqlite_tables_to_csv(file_map, output_dir):
+def export_sqlite_tables_to_csv(file_map, output_dir, strict=False, index=None):
+    tables_to_export = prepare_tables_to_export(file_map, strict=strict)
     conn = connect_db()
-    tables_to_export = prepare_tables_to_export(file_map)
 
     os.makedirs(output_dir, exist_ok=True)
 
@@ -107,49 +71,21 @@ def export_sqlite_tables_to_csv(file_map, output_dir):
         print("table", table)
         print("columns: ", columns)
 
-        if columns is None:
-            query = f'SELECT * FROM "{table}"'
-        else:
-            cols_sql = ', '.join([f'"{col}"' for col in columns])
-            query = f'SELECT {cols_sql} FROM "{table}"'
+        cols_sql = ', '.join([f'"{col}"' for col in columns])
+        query = f'SELECT {cols_sql} FROM "{table}"'
 
         df = pd.read_sql_query(query, conn)
         out_path_headers = os.path.join(output_dir, f"{item}_{table}.csv")
 
         df.to_csv(out_path_headers, index=False, sep=";")
+        if index is not None:
+            index.record(df, f"{item}_{table}", stage='export', filename=out_path_headers)
 
-        print(f"Exported {table} ({'all columns' if columns is None else f'{len(columns)} columns'})")
+        print(f"Exported {table} ({len(columns)} columns)")
 
     conn.close()
 
 
-def create_participants_summary_from_df(output_path):
-    print("\nPreparing participants summary...")
-    unique_values = {}
-    value_columns = ["unit", "condition", "randomize"]
-    # value_columns = ["participant_number", "VisitCode", "SiteCode"]  # --> only for MovisensESM
-
-    for file in os.listdir(output_path):
-        if file.endswith(".csv") and file.startswith("ITEM"):
-            filepath = os.path.join(output_path, file)
-            separator = detect_separator(filepath)
-            current_df = pd.read_csv(filepath, sep=separator, quotechar='"')
-
-            for _, row in current_df.iterrows():
-                identifier = row.iloc[0]
-                if pd.notna(identifier) and identifier not in unique_values:
-                    values = [row.get(col) for col in value_columns]
-                    unique_values[identifier] = values
-
-    unique_participants_df = pd.DataFrame.from_dict(unique_values, orient="index", columns=value_columns)
-    unique_participants_df.index.name = "participant_identifier"
-    unique_participants_df.reset_index(inplace=True)
-    output_filename = f'participants_conditions_summary.csv'
-    output_file = os.path.join(os.path.dirname(output_path), output_filename)
-    unique_participants_df.to_csv(output_file, sep=';', index=False)
-    print(f"Exported {len(unique_participants_df)} unique IDs in:\n{output_file}\n")
-
-
 def remove_header_from_csv(input_csv_path):
     for file in os.listdir(input_csv_path):
         if file.startswith("ITEM") and file.endswith(".csv"):
@@ -244,24 +180,32 @@ def main():
     info_to_yaml(filepath_requirements_id_00)
 
     # Step 2: Reads requirements from YAML.
-    requirements_dict, assessment_windows = read_yaml_file(filepath_requirements_id_00)
+    requirements_dict, assessment_windows, strict_variables = read_yaml_file(filepath_requirements_id_00)
+
+    # Participant x visit x table row counts, collected while exporting and filtering.
+    release_index = ReleaseIndex()
 
     # Step 3: Exports CSV files from Research DB tables.
-    export_sqlite_tables_to_csv(file_map=requirements_dict, output_dir=filepath_release_id_00)
+    export_sqlite_tables_to_csv(file_map=requirements_dict, output_dir=filepath_release_id_00,
+                                strict=strict_variables, index=release_index)
 
     # Step 4: Filtering per assessment window (Screening, Baseline, 2-month, 6-month, and 12-month).
-    assessment_window_filtering(assessment_list=assessment_windows, source_path=filepath_release_id_00)
+    assessment_window_filtering(assessment_list=assessment_windows, source_path=filepath_release_id_00,
+                                index=release_index)
     #
     # Step 5: Excludes participants whose dropped out from Baseline.
-    filtering_excluded_ids(baseline_ids_path=baseline_ids_directory, source_path=filepath_release_id_00)
+    filtering_excluded_ids(baseline_ids_path=baseline_ids_directory, source_path=filepath_release_id_00,
+                           index=release_index)
 
     # Step 6: Additional participant IDs filtering (depends on each data release).
     if os.path.isfile(additional_ids_filter_directory_id_00) and additional_ids_filter_directory_id_00.endswith('.xlsx'):
         filtering_interesting_ids(baseline_ids_path=additional_ids_filter_directory_id_00,
-                                  source_path=filepath_release_id_00)
+                                  source_path=filepath_release_id_00, index=release_index)
 
-    # Step 7: Creates a summary of participants (n=379).
-    create_participants_summary_from_df(filepath_release_id_00)
+    # Step 7: Saves the release index and creates a summary of participants (n=379) and window completeness from it.
+    release_index.save(os.path.dirname(filepath_release_id_00))
+    create_participants_summary_from_index(release_index, filepath_release_id_00)
+    create_window_completeness_report(release_index, filepath_release_id_00, assessment_windows)
 
     # Step 8: Pseudo
 
@@ -0,0 +1,112 @@
+import fnmatch
+import pandas as pd
+
+
+# Base columns kept for every exported table, per data source.
+BASE_COLUMN_PROFILES = {
+    'default': lambda cols: cols[:10],
+    'dmmh': lambda cols: [cols[i] for i in range(min(7, len(cols))) if i != 1],
+}
+
+WILDCARD_CHARS = ('*', '?', '[')
+
+
+def read_schema(conn):
+    '''
+    Reads the column names of every table in the DB with a single query: {table: [columns]}.
+    '''
+    query = (
+        "SELECT m.name AS table_name, p.name AS column_name "
+        "FROM sqlite_master AS m JOIN pragma_table_info(m.name) AS p "
+        "WHERE m.type = 'table' ORDER BY m.name, p.cid;"
+    )
+    info = pd.read_sql_query(query, conn)
+
+    schema = {}
+    for table, column in zip(info['table_name'], info['column_name']):
+        schema.setdefault(table, []).append(column)
+    return schema
+
+
+def as_list_of_str(values):
+    if isinstance(values, str):
+        return [values]
+    if isinstance(values, list):
+        return [v for v in values if isinstance(v, str)]
+    return []
+
+
+def resolve_variables(patterns, columns):
+    '''
+    Resolves requested variables against a table's columns. Patterns with wildcards (e.g. "phq9_*") are matched
+    with fnmatch, any other name must match a column exactly. Returns the resolved columns and the unmatched patterns.
+    '''
+    resolved = []
+    unmatched = []
+
+    for pattern in patterns:
+        if any(char in pattern for char in WILDCARD_CHARS):
+            matches = [col for col in columns if fnmatch.fnmatchcase(col, pattern)]
+        else:
+            matches = [pattern] if pattern in columns else []
+
+        if not matches:
+            unmatched.append(pattern)
+        resolved.extend(col for col in matches if col not in resolved)
+
+    return resolved, unmatched
+
+
+def plan_projection(file_map, schema):
+    '''
+    Plans the columns to read from each requested table. Every table is exported with its base columns (see
+    BASE_COLUMN_PROFILES) plus the requested variables; tables with no variables are exported with all their columns.
+    Returns the tables to export and the variables that did not match any table of their item: {item: [variables]}.
+    '''
+    tables_to_export = []
+    unknown_variables = {}
+
+    for item_number, item_data in file_map.items():
+        table_names = as_list_of_str(item_data.get('table_name', []))
+        variables_to_add = as_list_of_str(item_data.get('variables', None))
+
+        profile = item_data.get('base_columns') or 'default'
+        if profile not in BASE_COLUMN_PROFILES:
+            raise ValueError(f"Unknown base columns profile '{profile}' in item {item_number}. "
+                             f"Available profiles: {list(BASE_COLUMN_PROFILES)}")
+        select_base_cols = BASE_COLUMN_PROFILES[profile]
+
+        matched_variables = set()
+        for table in table_names:
+            if table not in schema:
+                print(f"Warning: Table '{table}' not found in DB. Skipping.")
+                continue
+
+            cols = schema[table]
+            if not variables_to_add:
+                selected_cols = list(cols)
+            else:
+                base_cols = select_base_cols(cols)
+                filter_cols, unmatched = resolve_variables(variables_to_add, cols)
+                selected_cols = base_cols + [c for c in filter_cols if c not in base_cols]
+                matched_variables.update(v for v in variables_to_add if v not in unmatched)
+
+            tables_to_export.append({
+                'item': item_number,
+                'table': table,
+                'columns': selected_cols
+            })
+
+        unknown = [v for v in variables_to_add if v not in matched_variables]
+        if unknown and any(table in schema for table in table_names):
+            unknown_variables[item_number] = unknown
+
+    return tables_to_export, unknown_variables
+
+
+def report_unknown_variables(unknown_variables):
+    if not unknown_variables:
+        return
+    print("\nWarning: Requested variables not found in DB:")
+    for item_number, variables in unknown_variables.items():
+        print(f"  {item_number}: {', '.join(variables)}")
@@ -0,0 +1,324 @@
+import os
+import re
+import numpy as np
+import pandas as pd
+from filtering import WINDOW_MAP, CODE_MAP
+
+
+STAGES = ['export', 'window', 'ids', 'interesting']
+VALUE_COLUMNS = ['unit', 'condition', 'randomize']
+VISIT_COLUMNS = ['VisitCode', 'visit_name']
+INDEX_FILENAME = 'release_index.npz'
+
+INTEGER_STRING = re.compile(r'^-?\d+\.0+$')
+
+
+def as_key(value):
+    '''
+    String key of an ID or visit value. Integer-valued floats (e.g. 101.0 after a CSV round-trip with NaNs) map to the
+    same key as the integer.
+    '''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    value = str(value).strip()
+    if INTEGER_STRING.match(value):
+        value = value.split('.')[0]
+    return value
+
+
+class Vocabulary:
+    def __init__(self, values=()):
+        self.values = list(values)
+        self.codes = {value: code for code, value in enumerate(self.values)}
+
+    def encode(self, series):
+        '''
+        Returns the integer codes of a series, adding unseen values. Missing values are encoded as -1.
+        '''
+        present = series.notna().to_numpy()
+        values = series[present]
+
+        lookup = {}
+        for value in pd.unique(values):
+            key = as_key(value)
+            if key not in self.codes:
+                self.codes[key] = len(self.values)
+                self.values.append(key)
+            lookup[value] = self.codes[key]
+
+        codes = np.full(len(series), -1, dtype=np.int32)
+        codes[present] = values.map(lookup).to_numpy()
+        return codes
+
+    def code(self, value):
+        return self.codes.get(as_key(value))
+
+    def __len__(self):
+        return len(self.values)
+
+
+class ReleaseIndex:
+    '''
+    Row counts per participant x visit x table x stage, plus unit/condition/randomize per participant, collected
+    while the release is exported and filtered. Everything is stored as integer codes into string vocabularies.
+    '''
+
+    def __init__(self):
+        self.participants = Vocabulary()
+        self.visits = Vocabulary()
+        self.tables = Vocabulary()
+        self.values = {col: Vocabulary() for col in VALUE_COLUMNS}
+        self.visit_columns = {}
+        # (table code, stage code) -> array of rows (participant, visit, count)
+        self._entries = {}
+        # (table code, stage code) -> array of rows (participant, unit, condition, randomize)
+        self._values = {}
+        # Files written in this run: file name -> (table, stage)
+        self._files = {}
+
+    def record(self, df, table, stage, filename=None):
+        '''
+        Records the rows of a table at a stage, replacing any previous record of the same table and stage.
+        '''
+        if stage not in STAGES:
+            raise ValueError(f"Unknown stage '{stage}'. Available stages: {STAGES}")
+        if filename is not None:
+            self._files[os.path.basename(filename)] = (table, stage)
+
+        table_code = self.tables.encode(pd.Series([table]))[0]
+        visit_column = next((col for col in VISIT_COLUMNS if col in df.columns), None)
+        self.visit_columns[table] = visit_column or ''
+        key = (table_code, STAGES.index(stage))
+        if df.empty:
+            self._entries[key] = np.empty((0, 3), dtype=np.int64)
+            self._values[key] = np.empty((0, 1 + len(VALUE_COLUMNS)), dtype=np.int64)
+            return
+
+        id_column = 'participant_identifier' if 'participant_identifier' in df.columns else df.columns[0]
+        participant_codes = self.participants.encode(df[id_column])
+
+        if visit_column is None:
+            visit_codes = np.full(len(df), -1, dtype=np.int32)
+        else:
+            visit_codes = self.visits.encode(df[visit_column])
+
+        keys = np.column_stack([participant_codes, visit_codes])[participant_codes >= 0]
+        if len(keys):
+            unique_keys, counts = np.unique(keys, axis=0, return_counts=True)
+            entry = np.column_stack([unique_keys, counts]).astype(np.int64)
+        else:
+            entry = np.empty((0, 3), dtype=np.int64)
+        self._entries[key] = entry
+        self._values[key] = self._first_values(df, participant_codes)
+
+    def table_of(self, filename, stage):
+        '''
+        Table of a file written at the given stage in this run, or None for any other file (e.g. a previous run's).
+        '''
+        table, file_stage = self._files.get(os.path.basename(filename), (None, None))
+        return table if file_stage == stage else None
+
+    def _first_values(self, df, participant_codes):
+        '''
+        First non-missing unit/condition/randomize per participant of a table, as rows (participant, values...).
+        '''
+        participants = np.unique(participant_codes[participant_codes >= 0])
+        values = np.full((len(participants), len(VALUE_COLUMNS)), -1, dtype=np.int64)
+
+        for i, col in enumerate(VALUE_COLUMNS):
+            if col not in df.columns:
+                continue
+            value_codes = self.values[col].encode(df[col])
+            valid = (participant_codes >= 0) & (value_codes >= 0)
+            valid_participants, first = np.unique(participant_codes[valid], return_index=True)
+            values[np.searchsorted(participants, valid_participants), i] = value_codes[valid][first]
+
+        return np.column_stack([participants, values]).astype(np.int64)
+
+    def participant_values(self, stage=None):
+        '''
+        Participants recorded at a stage and their first non-missing unit/condition/randomize codes (-1 if missing)
+        over the tables of that stage, in table order. Defaults to the final stage.
+        '''
+        stage = stage or self.final_stage()
+        rows = [values for (_, stage_code), values in sorted(self._values.items())
+                if stage is not None and stage_code == STAGES.index(stage)]
+        rows = np.vstack(rows) if rows else np.empty((0, 1 + len(VALUE_COLUMNS)), dtype=np.int64)
+
+        participants = np.unique(rows[:, 0])
+        values = np.full((len(participants), len(VALUE_COLUMNS)), -1, dtype=np.int64)
+        for i in range(len(VALUE_COLUMNS)):
+            valid = rows[:, i + 1] >= 0
+            valid_participants, first = np.unique(rows[valid, 0], return_index=True)
+            values[np.searchsorted(participants, valid_participants), i] = rows[valid, i + 1][first]
+        return participants, values
+
+    @property
+    def counts(self):
+        '''
+        Array of rows (participant, visit, table, stage, count).
+        '''
+        if not self._entries:
+            return np.empty((0, 5), dtype=np.int64)
+        return np.vstack([
+            np.column_stack([
+                entry[:, 0], entry[:, 1],
+                np.full(len(entry), table_code), np.full(len(entry), stage_code),
+                entry[:, 2]
+            ]).astype(np.int64)
+            for (table_code, stage_code), entry in sorted(self._entries.items())
+        ])
+
+    def final_stage(self):
+        if not self._entries:
+            return None
+        return STAGES[max(stage_code for _, stage_code in self._entries)]
+
+    def to_frame(self, stage=None):
+        '''
+        Row counts as a DataFrame with decoded participant, visit and table names. Defaults to the final stage.
+        '''
+        stage = stage or self.final_stage()
+        counts = self.counts
+        if stage is not None:
+            counts = counts[counts[:, 3] == STAGES.index(stage)]
+
+        participants = np.array(self.participants.values, dtype=object)
+        visits = np.array(self.visits.values + [None], dtype=object)
+        tables = np.array(self.tables.values, dtype=object)
+        return pd.DataFrame({
+            'participant_identifier': participants[counts[:, 0]],
+            'visit': visits[counts[:, 1]],
+            'table': tables[counts[:, 2]],
+            'rows': counts[:, 4],
+        })
+
+    def count(self, participant=None, visit=None, table=None, stage=None):
+        '''
+        Number of rows matching the given participant, visit and table. Defaults to the final stage.
+        '''
+        stage = stage or self.final_stage()
+        counts = self.counts
+        if stage is None:
+            return 0
+
+        mask = counts[:, 3] == STAGES.index(stage)
+        for column, vocabulary, value in [(0, self.participants, participant),
+                                          (1, self.visits, visit),
+                                          (2, self.tables, table)]:
+            if value is None:
+                continue
+            code = vocabulary.code(value)
+            if code is None:
+                return 0
+            mask &= counts[:, column] == code
+        return int(counts[mask, 4].sum())
+
+    def save(self, directory):
+        file_path = os.path.join(directory, INDEX_FILENAME)
+        vocabularies = {f'{col}_values': np.array(self.values[col].values, dtype=str) for col in VALUE_COLUMNS}
+        np.savez_compressed(
+            file_path,
+            counts=self.counts,
+            values=np.vstack([
+                np.column_stack([np.full((len(rows), 2), key), rows])
+                for key, rows in sorted(self._values.items())
+            ] or [np.empty((0, 3 + len(VALUE_COLUMNS)))]).astype(np.int64),
+            participants=np.array(self.participants.values, dtype=str),
+            visits=np.array(self.visits.values, dtype=str),
+            tables=np.array(self.tables.values, dtype=str),
+            visit_columns=np.array([self.visit_columns.get(t, '') for t in self.tables.values], dtype=str),
+            **vocabularies
+        )
+        print(f"Release index saved in:\n{file_path}\n")
+        return file_path
+
+    @classmethod
+    def load(cls, file_path):
+        index = cls()
+        with np.load(file_path, allow_pickle=False) as data:
+            counts = data['counts'].astype(np.int64).reshape(-1, 5)
+            values = data['values'].astype(np.int64).reshape(-1, 3 + len(VALUE_COLUMNS))
+            index.participants = Vocabulary(data['participants'].tolist())
+            index.visits = Vocabulary(data['visits'].tolist())
+            index.tables = Vocabulary(data['tables'].tolist())
+            index.visit_columns = dict(zip(index.tables.values, data['visit_columns'].tolist()))
+            index.values = {col: Vocabulary(data[f'{col}_values'].tolist()) for col in VALUE_COLUMNS}
+
+        for table_code, stage_code in np.unique(counts[:, 2:4], axis=0):
+            rows = (counts[:, 2] == table_code) & (counts[:, 3] == stage_code)
+            index._entries[(int(table_code), int(stage_code))] = counts[rows][:, [0, 1, 4]]
+        for table_code, stage_code in np.unique(values[:, :2], axis=0):
+            rows = (values[:, 0] == table_code) & (values[:, 1] == stage_code)
+            index._values[(int(table_code), int(stage_code))] = values[rows][:, 2:]
+        return index
+
+
+def create_participants_summary_from_index(index, output_path):
+    '''
+    Writes participants_conditions_summary.csv next to the release folder for the participants left after the
+    final filtering stage.
+    '''
+    print("\nPreparing participants summary from release index...")
+    participants, values = index.participant_values()
+
+    summary = {'participant_identifier': [index.participants.values[p] for p in participants]}
+    for i, col in enumerate(VALUE_COLUMNS):
+        codes = values[:, i]
+        summary[col] = [index.values[col].values[c] if c >= 0 else None for c in codes]
+
+    unique_participants_df = pd.DataFrame(summary)
+    output_file = os.path.join(os.path.dirname(output_path), 'participants_conditions_summary.csv')
+    unique_participants_df.to_csv(output_file, sep=';', index=False)
+    print(f"Exported {len(unique_participants_df)} unique IDs in:\n{output_file}\n")
+    return unique_participants_df
+
+
+def create_window_completeness_report(index, output_path, assessment_list):
+    '''
+    Writes assessment_window_completeness.csv next to the release folder: per table and requested assessment window,
+    the number of participants with at least one row, out of all participants left after the final filtering stage.
+    Screening and Baseline share VisitCode 0, so they are reported together for VisitCode tables.
+    '''
+    print("\nPreparing assessment window completeness report...")
+    windows = assessment_list if isinstance(assessment_list, list) else [assessment_list]
+    windows = [window for window in windows if window in WINDOW_MAP]
+
+    df = index.to_frame()
+    n_participants = df['participant_identifier'].nunique()
+
+    report = []
+    for table in index.tables.values:
+        table_df = df[df['table'] == table]
+        visits = table_df['visit'].fillna('').astype(str)
+        visit_column = index.visit_columns.get(table)
+
+        if visit_column == 'VisitCode':
+            windows_per_code = {}
+            for window in windows:
+                windows_per_code.setdefault(str(CODE_MAP[window]), []).append(window)
+            selections = [('/'.join(code_windows), visits == code) for code, code_windows in windows_per_code.items()]
+        elif visit_column == 'visit_name':
+            selections = [(window, visits.str.contains(WINDOW_MAP[window], case=False, regex=False))
+                          for window in windows]
+        else:
+            continue
+
+        for window, in_window in selections:
+            window_df = table_df[in_window]
+            n_with_rows = window_df['participant_identifier'].nunique()
+            report.append({
+                'assessment_window': window,
+                'table': table,
+                'participants_with_rows': n_with_rows,
+                'participants_total': n_participants,
+                'completeness': round(n_with_rows / n_participants, 4) if n_participants else 0.0,
+                'rows': int(window_df['rows'].sum()),
+            })
+
+    report_df = pd.DataFrame(report, columns=['assessment_window', 'table', 'participants_with_rows',
+                                              'participants_total', 'completeness', 'rows'])
+    output_file = os.path.join(os.path.dirname(output_path), 'assessment_window_completeness.csv')
+    report_df.to_csv(output_file, sep=';', index=False)
+    print(f"Exported completeness report in:\n{output_file}\n")
+    return report_df
@@ -0,0 +1,49 @@
+import pytest
+from projection import resolve_variables, plan_projection
+
+
+COLUMNS = [f'base_{i}' for i in range(10)] + ['phq9_1', 'phq9_2', 'phq9_total', 'gad7_1']
+
+
+def test_resolve_variables_wildcard_and_exact():
+    resolved, unmatched = resolve_variables(['phq9_?', 'gad7_1', 'phq9'], COLUMNS)
+    assert resolved == ['phq9_1', 'phq9_2', 'gad7_1']
+    assert unmatched == ['phq9']
+
+
+def test_resolve_variables_removes_duplicates():
+    resolved, unmatched = resolve_variables(['phq9_*', 'phq9_1'], COLUMNS)
+    assert resolved == ['phq9_1', 'phq9_2', 'phq9_total']
+    assert unmatched == []
+
+
+def test_plan_projection_skips_base_columns_already_selected():
+    file_map = {'ITEM1': {'table_name': 'phq', 'variables': ['base_1', 'base_*', 'phq9_total']}}
+    tables, unknown = plan_projection(file_map, {'phq': COLUMNS})
+    assert tables == [{'item': 'ITEM1', 'table': 'phq', 'columns': COLUMNS[:10] + ['phq9_total']}]
+    assert unknown == {}
+
+
+def test_plan_projection_without_variables_selects_all_columns():
+    tables, _ = plan_projection({'ITEM1': {'table_name': ['phq']}}, {'phq': COLUMNS})
+    assert tables[0]['columns'] == COLUMNS
+
+
+def test_plan_projection_dmmh_profile_on_short_table():
+    file_map = {'ITEM1': {'table_name': 'dmmh', 'variables': ['d'], 'base_columns': 'dmmh'}}
+    tables, _ = plan_projection(file_map, {'dmmh': ['a', 'b', 'c', 'd']})
+    assert tables[0]['columns'] == ['a', 'c', 'd']
+
+
+def test_plan_projection_reports_variables_unknown_in_all_tables_of_item():
+    schema = {'phq': COLUMNS, 'gad': ['base_0', 'gad7_2']}
+    file_map = {'ITEM1': {'table_name': ['phq', 'gad', 'missing'], 'variables': ['gad7_2', 'phq9_1', 'typo_*']}}
+    tables, unknown = plan_projection(file_map, schema)
+    assert [entry['table'] for entry in tables] == ['phq', 'gad']
+    assert unknown == {'ITEM1': ['typo_*']}
+
+
+def test_plan_projection_unknown_profile_raises():
+    file_map = {'ITEM1': {'table_name': 'phq', 'variables': ['phq9_1'], 'base_columns': 'nope'}}
+    with pytest.raises(ValueError):
+        plan_projection(file_map, {'phq': COLUMNS})
@@ -0,0 +1,149 @@
+import os
+import numpy as np
+import pandas as pd
+from filtering import assessment_window_filtering, filtering_excluded_ids
+from release_index import ReleaseIndex, create_participants_summary_from_index, create_window_completeness_report
+
+
+def phq_df():
+    return pd.DataFrame({
+        'participant_identifier': ['P1', 'P1', 'P2', 'P3', None],
+        'VisitCode': [0, 1, 0, 2, 0],
+        'unit': ['u1', 'u1', None, 'u3', 'u9'],
+        'condition': [1, 1, 0, None, 1],
+        'randomize': ['r1', 'r1', 'r2', 'r3', 'r9'],
+    })
+
+
+def test_record_and_count():
+    index = ReleaseIndex()
+    index.record(phq_df(), '1_phq', stage='export')
+
+    assert index.count() == 4
+    assert index.count(participant='P1') == 2
+    assert index.count(participant='P1', visit=0) == 1
+    assert index.count(participant='P1', table='1_esm') == 0
+    assert index.count(participant='unknown') == 0
+
+
+def test_record_replaces_same_table_and_stage():
+    index = ReleaseIndex()
+    index.record(phq_df(), '1_phq', stage='export')
+    index.record(phq_df(), '1_phq', stage='export')
+    index.record(phq_df().iloc[:2], '1_phq', stage='export')
+
+    assert index.count(participant='P1') == 2
+    assert index.count() == 2
+
+
+def test_integer_valued_floats_share_codes():
+    index = ReleaseIndex()
+    index.record(pd.DataFrame({'participant_identifier': [101, 102], 'VisitCode': [0, 1]}), '1_phq', stage='export')
+    index.record(pd.DataFrame({'participant_identifier': [101.0, np.nan], 'VisitCode': [0.0, 1.0]}),
+                 '1_phq', stage='window')
+
+    assert index.participants.values == ['101', '102']
+    assert index.visits.values == ['0', '1']
+    assert index.count(participant=101, visit=0, stage='window') == 1
+
+
+def test_first_non_missing_value_wins():
+    index = ReleaseIndex()
+    index.record(pd.DataFrame({'participant_identifier': ['P1', 'P2'], 'unit': [None, 'u2']}), '1_esm', stage='export')
+    index.record(phq_df(), '1_phq', stage='export')
+
+    summary = create_participants_summary_from_index(index, os.devnull)
+    assert summary['participant_identifier'].tolist() == ['P1', 'P2', 'P3']
+    assert summary['unit'].tolist() == ['u1', 'u2', 'u3']
+    assert summary['randomize'].tolist() == ['r1', 'r2', 'r3']
+
+
+def test_summary_uses_values_from_final_stage_rows():
+    index = ReleaseIndex()
+    phq = pd.DataFrame({'participant_identifier': ['P1', 'P2'], 'VisitCode': [3, 0], 'unit': ['u', 'u2']})
+    esm = pd.DataFrame({'participant_identifier': ['P1'], 'VisitCode': [0], 'unit': ['x']})
+    index.record(phq, '1_phq', stage='export')
+    index.record(esm, '2_esm', stage='export')
+    index.record(phq[phq['VisitCode'] == 0], '1_phq', stage='window')
+    index.record(esm, '2_esm', stage='window')
+
+    summary = create_participants_summary_from_index(index, os.devnull)
+    assert summary[['participant_identifier', 'unit']].values.tolist() == [['P1', 'x'], ['P2', 'u2']]
+
+
+def test_final_stage_selects_filtered_participants():
+    index = ReleaseIndex()
+    df = phq_df()
+    index.record(df, '1_phq', stage='export')
+    index.record(df[df['participant_identifier'] != 'P3'], '1_phq', stage='ids')
+
+    assert index.final_stage() == 'ids'
+    assert index.count(participant='P3') == 0
+    assert index.count(participant='P3', stage='export') == 1
+    assert set(index.to_frame()['participant_identifier']) == {'P1', 'P2'}
+
+
+def test_save_and_load(tmp_path):
+    index = ReleaseIndex()
+    index.record(phq_df(), '1_phq', stage='export')
+    index.record(pd.DataFrame({'participant_identifier': ['P2'], 'visit_name': ['Baseline']}), '1_esm', stage='ids')
+
+    loaded = ReleaseIndex.load(index.save(tmp_path))
+
+    assert np.array_equal(loaded.counts, index.counts)
+    for stage in ['export', 'ids']:
+        for loaded_array, array in zip(loaded.participant_values(stage), index.participant_values(stage)):
+            assert np.array_equal(loaded_array, array)
+    assert loaded.visit_columns == {'1_phq': 'VisitCode', '1_esm': 'visit_name'}
+    assert loaded.final_stage() == 'ids'
+    assert loaded.count(participant='P1', stage='export') == 2
+
+    loaded.record(phq_df().iloc[:1], '1_phq', stage='export')
+    assert loaded.count(stage='export') == 1
+
+
+def test_completeness_report_uses_requested_windows(tmp_path):
+    index = ReleaseIndex()
+    index.record(phq_df(), '1_phq', stage='export')
+    index.record(pd.DataFrame({'participant_identifier': ['P1'], 'visit_name': ['T1']}), '1_esm', stage='export')
+
+    report = create_window_completeness_report(index, os.path.join(tmp_path, 'release'),
+                                               ['Screening', 'Baseline', '2-month post-baseline'])
+
+    assert report[['assessment_window', 'table', 'participants_with_rows']].values.tolist() == [
+        ['Screening/Baseline', '1_phq', 2],
+        ['2-month post-baseline', '1_phq', 1],
+        ['Screening', '1_esm', 0],
+        ['Baseline', '1_esm', 0],
+        ['2-month post-baseline', '1_esm', 1],
+    ]
+    assert os.path.isfile(os.path.join(tmp_path, 'assessment_window_completeness.csv'))
+
+
+def run_release(source_path, excluded_ids_path):
+    index = ReleaseIndex()
+    out_path = os.path.join(source_path, '3_phq9.csv')
+    df = phq_df()
+    df.to_csv(out_path, index=False, sep=';')
+    index.record(df, '3_phq9', stage='export', filename=out_path)
+
+    assessment_window_filtering(['Baseline', '2-month post-baseline'], source_path, index=index)
+    filtering_excluded_ids(excluded_ids_path, source_path, index=index)
+    return index
+
+
+def test_rerun_into_existing_release_folder(tmp_path):
+    source_path = tmp_path / 'release'
+    source_path.mkdir()
+    excluded_ids_path = tmp_path / 'excluded.xlsx'
+    pd.DataFrame([['P2']]).to_excel(excluded_ids_path, header=False, index=False)
+
+    first = run_release(str(source_path), excluded_ids_path)
+    second = run_release(str(source_path), excluded_ids_path)
+
+    for index in [first, second]:
+        assert index.tables.values == ['3_phq9']
+        assert index.final_stage() == 'ids'
+        assert index.count(participant='P1') == 2
+        assert index.count(participant='P2') == 0
+        assert index.count(stage='window') == 3